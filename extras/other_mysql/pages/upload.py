@@ -7,10 +7,17 @@ Supports CSV upload → DataFrame preview → validation → MySQL load.
 
 import uuid
 import streamlit as st
+import numpy as np
 import pandas as pd
 from datetime import datetime
 
-from utils.db import load_dataframe_to_mysql, test_connection, get_recent_uploads
+from utils.db import upload_dataframe, test_connection, fetch_recent_uploads
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+except ImportError:  # fall back to the pandas C parser
+    pa = pacsv = None
 
 # Expected columns for customer default data (flexible — warnings not blocks)
 EXPECTED_COLUMNS = [
@@ -18,8 +25,36 @@ EXPECTED_COLUMNS = [
     "loan_term", "credit_score", "default_flag"
 ]
 
+# Explicit parse types so chunked reads skip dtype inference (nullable ints tolerate gaps)
+EXPECTED_DTYPES = {
+    "customer_id": "Int64", "age": "Int64", "gender": "object", "income": "float64",
+    "loan_amount": "float64", "loan_term": "Int64", "credit_score": "Int64",
+    "default_flag": "Int64",
+}
+
+if pa is not None:
+    _ARROW_TYPES = {
+        col: {"Int64": pa.int64(), "float64": pa.float64(), "object": pa.string()}[dtype]
+        for col, dtype in EXPECTED_DTYPES.items()
+    }
+    # Keep integer columns nullable, matching the pandas-path dtypes
+    _ARROW_TO_PANDAS = {pa.int64(): pd.Int64Dtype()}
+
 TARGET_TABLE = "customer_default_data"
 
+# Rows parsed per chunk — bounds memory regardless of upload size
+CSV_CHUNK_SIZE = 50_000
+
+# Cap what gets serialized to the browser on every rerun
+AUDIT_PAGE_ROWS = 25
+NULL_TABLE_ROWS = 50
+
+
+@st.cache_data(ttl=30, show_spinner=False)
+def _cached_recent_uploads(table: str) -> pd.DataFrame:
+    """Recent uploads, cached so widget reruns don't re-query MySQL."""
+    return fetch_recent_uploads(table)
+
 
 def render_upload_page():
     # ── Top navigation bar ────────────────────────────────────────────────────
@@ -138,9 +173,10 @@ def render_upload_page():
             help="Accepted format: CSV with headers. Max size: 200MB"
         )
 
-        if uploaded_file is not None:
+        stats = _scan_uploaded_csv(uploaded_file) if uploaded_file is not None else None
+        if stats is not None:
             # ── Step 2: Preview & Validate ─────────────────────────────────────
-            df = pd.read_csv(uploaded_file)
+            preview = stats["preview"]
 
             st.markdown(f"""
             <p style="font-family:'DM Mono',monospace;font-size:0.7rem;
@@ -152,15 +188,15 @@ def render_upload_page():
 
             # File stats
             col_a, col_b, col_c = st.columns(3)
-            _stat_card(col_a, "Rows",    f"{len(df):,}")
-            _stat_card(col_b, "Columns", f"{len(df.columns)}")
-            _stat_card(col_c, "Nulls",   f"{df.isna().sum().sum():,}")
+            _stat_card(col_a, "Rows",    f"{stats['rows']:,}")
+            _stat_card(col_b, "Columns", f"{len(preview.columns)}")
+            _stat_card(col_c, "Nulls",   f"{stats['total_nulls']:,}")
 
             st.markdown("<br>", unsafe_allow_html=True)
 
             # Column warnings
-            missing_cols = [c for c in EXPECTED_COLUMNS if c not in df.columns]
-            extra_cols   = [c for c in df.columns if c not in EXPECTED_COLUMNS]
+            missing_cols = [c for c in EXPECTED_COLUMNS if c not in preview.columns]
+            extra_cols   = [c for c in preview.columns if c not in EXPECTED_COLUMNS]
 
             if missing_cols:
                 st.warning(f"⚠️ Expected columns not found: `{'`, `'.join(missing_cols)}`")
@@ -174,19 +210,21 @@ def render_upload_page():
                 margin-bottom:0.3rem;">DATA PREVIEW (first 5 rows)</p>
             """, unsafe_allow_html=True)
             st.dataframe(
-                df.head(5),
+                preview,
                 use_container_width=True,
                 hide_index=True
             )
 
             # Null analysis
             with st.expander("📊 Null value analysis per column"):
-                null_df = df.isna().sum().reset_index()
-                null_df.columns = ["Column", "Null Count"]
-                null_df["Null %"] = (null_df["Null Count"] / len(df) * 100).round(2)
-                null_df = null_df[null_df["Null Count"] > 0]
-                if len(null_df):
-                    st.dataframe(null_df, use_container_width=True, hide_index=True)
+                # Streamlit runs expander bodies even when collapsed, so only build
+                # the table when there is something to show, from the cached counts
+                if stats["total_nulls"]:
+                    null_df = pd.DataFrame({"Column": preview.columns, "Null Count": stats["null_counts"]})
+                    null_df = null_df[null_df["Null Count"] > 0]
+                    null_df = null_df.assign(**{"Null %": (null_df["Null Count"] / stats["rows"] * 100).round(2)})
+                    st.dataframe(null_df.nlargest(NULL_TABLE_ROWS, "Null Count"),
+                                 use_container_width=True, hide_index=True)
                 else:
                     st.success("No null values found in any column!")
 
@@ -214,17 +252,11 @@ def render_upload_page():
                  "Fill nulls with 0 / empty string"]
             )
 
-            # Apply null handling
-            df_to_upload = df.copy()
+            # Null handling is applied per chunk at upload time
+            rows_to_upload = stats["rows"]
             if handle_nulls == "Drop rows with any null":
-                before = len(df_to_upload)
-                df_to_upload = df_to_upload.dropna()
-                st.info(f"Dropped {before - len(df_to_upload):,} rows with nulls. {len(df_to_upload):,} rows remain.")
-            elif handle_nulls == "Fill nulls with 0 / empty string":
-                num_cols = df_to_upload.select_dtypes(include="number").columns
-                str_cols = df_to_upload.select_dtypes(include="object").columns
-                df_to_upload[num_cols] = df_to_upload[num_cols].fillna(0)
-                df_to_upload[str_cols] = df_to_upload[str_cols].fillna("")
+                rows_to_upload = stats["complete_rows"]
+                st.info(f"Dropped {stats['rows'] - rows_to_upload:,} rows with nulls. {rows_to_upload:,} rows remain.")
 
             batch_id = str(uuid.uuid4())[:8].upper()
             st.markdown(f"""
@@ -238,18 +270,36 @@ def render_upload_page():
             st.markdown("<br>", unsafe_allow_html=True)
 
             # ── Upload Button ──────────────────────────────────────────────────
-            if st.button(f"⬆ Upload {len(df_to_upload):,} Rows to MySQL", use_container_width=True):
+            if st.button(f"⬆ Upload {rows_to_upload:,} Rows to MySQL", use_container_width=True):
                 with st.spinner("Loading data to MySQL..."):
-                    success, message, rows_inserted = load_dataframe_to_mysql(
-                        df=df_to_upload,
-                        table_name=table_name,
-                        uploaded_by=st.session_state.username,
-                        batch_id=batch_id,
-                    )
+                    success, message, rows_inserted = True, None, 0
+                    try:
+                        for chunk in _read_csv_chunks(uploaded_file, **stats["read_opts"]):
+                            chunk = _apply_null_handling(chunk, handle_nulls)
+                            if chunk.empty:
+                                continue
+                            result = upload_dataframe(
+                                chunk,
+                                uploaded_by=st.session_state.username,
+                                table_name=table_name,
+                            )
+                            # On failure this counts what earlier INSERT batches already committed
+                            rows_inserted += result["rows_inserted"]
+                            if not result["success"]:
+                                success, message = False, result["error"]
+                                break
+                    except ValueError as e:  # a parse error part-way through the file
+                        success, message = False, f"Could not parse the CSV: {e}"
 
                 if success:
+                    _cached_recent_uploads.clear()
                     st.success(f"✅ Successfully uploaded **{rows_inserted:,} rows** to `{table_name}` (Batch: {batch_id})")
                     st.balloons()
+                elif rows_inserted:
+                    # Each chunk commits on its own, so earlier chunks are already in the table
+                    _cached_recent_uploads.clear()
+                    st.error(f"❌ Upload failed: {message}. "
+                             f"{rows_inserted:,} rows were already committed to `{table_name}`.")
                 else:
                     st.error(f"❌ Upload failed: {message}")
 
@@ -263,9 +313,16 @@ def render_upload_page():
         </p>
         """, unsafe_allow_html=True)
 
-        audit_df = get_recent_uploads(TARGET_TABLE)
+        audit_df = _cached_recent_uploads(TARGET_TABLE)
         if not audit_df.empty:
-            st.dataframe(audit_df, use_container_width=True, hide_index=True)
+            st.dataframe(audit_df.head(AUDIT_PAGE_ROWS), use_container_width=True, hide_index=True)
+            if len(audit_df) > AUDIT_PAGE_ROWS:
+                with st.expander("Show more"):
+                    n_pages = -(-len(audit_df) // AUDIT_PAGE_ROWS)
+                    page = st.number_input("Page", min_value=2, max_value=n_pages, value=2, step=1)
+                    start = (page - 1) * AUDIT_PAGE_ROWS
+                    st.dataframe(audit_df.iloc[start:start + AUDIT_PAGE_ROWS],
+                                 use_container_width=True, hide_index=True)
         else:
             st.markdown("""
             <div style="
@@ -298,6 +355,97 @@ def render_upload_page():
         st.dataframe(pd.DataFrame(schema_data), use_container_width=True, hide_index=True)
 
 
+def _read_csv_chunks(uploaded_file, typed: bool = True, use_arrow: bool = True):
+    """
+    Yield the uploaded CSV as bounded-size DataFrames.
+    Uses pyarrow's multi-threaded streaming parser when installed and use_arrow
+    is set, otherwise pandas in CSV_CHUNK_SIZE-row chunks.
+    With typed=False no EXPECTED_DTYPES are forced and pandas infers every column.
+    """
+    uploaded_file.seek(0)
+    if not typed:
+        yield from pd.read_csv(uploaded_file, chunksize=CSV_CHUNK_SIZE)
+        return
+    if pacsv is None or not use_arrow:
+        yield from pd.read_csv(uploaded_file, chunksize=CSV_CHUNK_SIZE, dtype=EXPECTED_DTYPES)
+        return
+
+    reader = pacsv.open_csv(
+        uploaded_file,
+        read_options=pacsv.ReadOptions(block_size=8 << 20),
+        convert_options=pacsv.ConvertOptions(column_types=_ARROW_TYPES, strings_can_be_null=True),
+    )
+    for batch in reader:
+        yield batch.to_pandas(types_mapper=_ARROW_TO_PANDAS.get)
+
+
+def _scan_uploaded_csv(uploaded_file):
+    """
+    Scan the upload with EXPECTED_DTYPES, falling back to inferred types when
+    the file's values don't fit them (e.g. ids like CUST-001 or a Y/N flag).
+    Returns None, after showing the error, if the file can't be parsed at all.
+    """
+    # pyarrow's streaming reader freezes the types it infers for non-expected columns
+    # after the first block and fails if one changes later; pandas infers per chunk
+    for read_opts in ({}, {"use_arrow": False}, {"typed": False}):
+        try:
+            stats = _scan_csv(uploaded_file, **read_opts)
+        except ValueError as e:  # pyarrow's ArrowInvalid is a ValueError too
+            error = e
+            continue
+        if not read_opts.get("typed", True):
+            st.warning("⚠️ Some columns don't match the expected types — uploading with types inferred from the file.")
+        return stats
+    st.error(f"❌ Could not parse the CSV: {error}")
+    return None
+
+
+def _scan_csv(uploaded_file, **read_opts) -> dict:
+    """
+    Stream the CSV once, keeping only the preview rows and running counters
+    (rows, complete rows, nulls per column) instead of the full DataFrame.
+    null_counts is a NumPy vector aligned with preview.columns; read_opts are
+    passed to _read_csv_chunks and returned so the upload reads the same way.
+    """
+    preview, null_counts = None, None
+    rows = complete_rows = 0
+    for chunk in _read_csv_chunks(uploaded_file, **read_opts):
+        # One isna() pass per chunk feeds every null statistic below
+        nan_mask = chunk.isna().values
+        per_col = nan_mask.sum(axis=0)
+        if preview is None:
+            preview, null_counts = chunk.head(5), per_col
+        else:
+            null_counts = null_counts + per_col
+        rows += len(chunk)
+        complete_rows += int((~nan_mask.any(axis=1)).sum())
+
+    if preview is None:
+        preview, null_counts = pd.DataFrame(), np.zeros(0, dtype="int64")
+    return {
+        "preview": preview,
+        "null_counts": null_counts,
+        "total_nulls": int(null_counts.sum()),
+        "rows": rows,
+        "complete_rows": complete_rows,
+        "read_opts": read_opts,
+    }
+
+
+def _apply_null_handling(df: pd.DataFrame, handle_nulls: str) -> pd.DataFrame:
+    """
+    Apply the selected null-handling option to one chunk.
+    "Keep as NULL" returns the chunk untouched; the other options build a new frame.
+    """
+    if handle_nulls == "Drop rows with any null":
+        return df.dropna()
+    if handle_nulls == "Fill nulls with 0 / empty string":
+        num_cols = df.select_dtypes(include="number").columns
+        str_cols = df.select_dtypes(include="object").columns
+        return df.fillna({**{c: 0 for c in num_cols}, **{c: "" for c in str_cols}})
+    return df
+
+
 def _stat_card(col, label: str, value: str):
     """Render a small metric card."""
     with col:
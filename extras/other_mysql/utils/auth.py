@@ -4,41 +4,67 @@ utils/auth.py
 Handles login authentication using credentials stored in .env file.
 
 .env format:
-    DS_USERS=alice:pass123,bob:securepass,carol:mypassword
+    DS_USERS='alice:$2b$12$...,bob:$2b$12$...'
 
-Each user has their own username:password pair separated by commas.
+Each user has their own username:bcrypt-hash pair separated by commas.
+Generate a hash with:
+    python -c "import bcrypt; print(bcrypt.hashpw(b'pass123', bcrypt.gensalt()).decode())"
+
+Migrating from plaintext entries (alice:pass123): replace each password with
+its hash from the command above and restart the app. Plaintext entries no
+longer log in; a warning naming the user is logged at startup.
 """
 
 import os
+import logging
+from functools import lru_cache
+import bcrypt
 import streamlit as st
 from dotenv import load_dotenv
 
 load_dotenv()
+log = logging.getLogger("AUTH")
+
+# Prefixes of the bcrypt hash formats checkpw accepts
+_BCRYPT_PREFIXES = ("$2a$", "$2b$", "$2y$")
 
 
+@lru_cache(maxsize=1)
 def _get_users() -> dict:
     """
-    Parse DS_USERS from .env into a dict of {username: password}.
+    Parse DS_USERS from .env into a dict of {username: password_hash}.
+    Parsed once per process; restart the app after editing .env.
 
     .env example:
-        DS_USERS=alice:pass123,bob:securepass,carol:mypassword
+        DS_USERS='alice:$2b$12$...,bob:$2b$12$...'
     """
     raw = os.getenv("DS_USERS", "")
     users = {}
     for entry in raw.split(","):
         entry = entry.strip()
         if ":" in entry:
-            username, password = entry.split(":", 1)
-            users[username.strip()] = password.strip()
+            username, password_hash = entry.split(":", 1)
+            username, password_hash = username.strip(), password_hash.strip()
+            if not password_hash.startswith(_BCRYPT_PREFIXES):
+                log.warning(f"DS_USERS entry for '{username}' is not a bcrypt hash; "
+                            "this user cannot log in until it is regenerated")
+            users[username] = password_hash
     return users
 
 
 def authenticate(username: str, password: str) -> bool:
     """
     Returns True if username/password match a registered data scientist.
+    bcrypt.checkpw compares in constant time, so no prefix/length leaks via timing.
     """
-    users = _get_users()
-    return users.get(username) == password
+    stored = _get_users().get(username)
+    if stored is None:
+        return False
+    try:
+        return bcrypt.checkpw(password.encode(), stored.encode())
+    except ValueError:  # malformed hash in .env
+        log.warning(f"Malformed password hash in DS_USERS for '{username}'")
+        return False
 
 
 def logout():
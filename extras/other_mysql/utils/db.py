@@ -6,18 +6,80 @@ MySQL connection and data upload utilities using mysql-connector-python.
 
 import os
 import logging
+import tempfile
 import pandas as pd
+import streamlit as st
 import mysql.connector
-from mysql.connector import Error
+from mysql.connector import Error, errorcode, pooling
 from dotenv import load_dotenv
 
 load_dotenv()
 log = logging.getLogger("DB")
 
+# Rows per committed batch on the INSERT fallback path
+BATCH_SIZE = int(os.getenv("MYSQL_BATCH_SIZE", 20000))
+# Rows packed into one multi-row INSERT ... VALUES (...), (...) statement
+ROWS_PER_STMT = 1000
+MAX_PLACEHOLDERS = 65535
+
+# pandas dtype → MySQL column type (object columns are sized by _varchar_type)
+MYSQL_TYPES = {
+    "int64":   "BIGINT",
+    "Int64":   "BIGINT",
+    "float64": "DOUBLE",
+    "bool":    "TINYINT(1)",
+    "datetime64[ns]": "DATETIME",
+}
+# Text columns stay VARCHAR(255) unless the data is already longer; then TEXT
+VARCHAR_LEN = 255
+
+# Columns added by the portal itself on every table
+METADATA_COLUMNS = {
+    "uploaded_by": "VARCHAR(100)",
+    "uploaded_at": "TIMESTAMP DEFAULT CURRENT_TIMESTAMP",
+}
+
+# Tables already created/verified by this process — skips repeat CREATE round-trips
+_ensured_tables: set = set()
+
+# Errors raised when LOCAL INFILE is switched off on the server (or client)
+_LOCAL_INFILE_DISABLED = {
+    errorcode.ER_NOT_ALLOWED_COMMAND,
+    errorcode.ER_CLIENT_LOCAL_FILES_DISABLED,
+}
+
+
+def _connect_args() -> dict:
+    """MySQL credentials from .env, shared by the pool and the health check."""
+    return dict(
+        host=os.getenv("MYSQL_HOST", "localhost"),
+        port=int(os.getenv("MYSQL_PORT", 3306)),
+        user=os.getenv("MYSQL_USER"),
+        password=os.getenv("MYSQL_PASSWORD"),
+        database=os.getenv("MYSQL_DATABASE", "deta_bank"),
+    )
+
+
+@st.cache_resource
+def _pool() -> pooling.MySQLConnectionPool:
+    """
+    Build the shared MySQL connection pool once per Streamlit process.
+    No connection_timeout here: it is also the socket read timeout for every
+    statement, and bulk loads or DDL waiting on a lock can legitimately run long.
+    """
+    return pooling.MySQLConnectionPool(
+        pool_name="deta",
+        pool_size=5,
+        **_connect_args(),
+        allow_local_infile=True,
+        autocommit=False,
+    )
+
 
 def get_connection():
     """
-    Create and return a MySQL connection using .env credentials.
+    Check out a MySQL connection from the shared pool using .env credentials.
+    Callers must .close() it to return it to the pool.
 
     .env variables required:
         MYSQL_HOST=localhost
@@ -26,52 +88,200 @@ def get_connection():
         MYSQL_PASSWORD=yourpassword
         MYSQL_DATABASE=deta_bank
     """
-    return mysql.connector.connect(
-        host=os.getenv("MYSQL_HOST", "localhost"),
-        port=int(os.getenv("MYSQL_PORT", 3306)),
-        user=os.getenv("MYSQL_USER"),
-        password=os.getenv("MYSQL_PASSWORD"),
-        database=os.getenv("MYSQL_DATABASE", "deta_bank"),
+    return _pool().get_connection()
+
+
+@st.cache_data(ttl=30, show_spinner=False)
+def test_connection() -> tuple:
+    """
+    Lightweight health check on its own short-timeout connection, so the
+    badge fails fast without capping statement time on the shared pool.
+    Cached so the status badge doesn't hit MySQL on every rerun.
+
+    Returns:
+        (ok, message) — message is the database name or the error text
+    """
+    try:
+        conn = mysql.connector.connect(**_connect_args(), connection_timeout=2)
+        try:
+            conn.ping()
+            return True, os.getenv("MYSQL_DATABASE", "deta_bank")
+        finally:
+            conn.close()
+    except Error as e:
+        log.error(f"Connection check failed: {e}")
+        return False, str(e)
+
+
+def _varchar_type(series: pd.Series) -> str:
+    """
+    VARCHAR(255) for text columns, or TEXT when a value in this (first) chunk
+    is already longer. Longer values in later chunks are caught by the
+    warning check in _load_data_infile rather than silently truncated.
+    """
+    longest = series.dropna().astype(str).str.len().max()
+    if not pd.isna(longest) and longest > VARCHAR_LEN:
+        return "TEXT"
+    return f"VARCHAR({VARCHAR_LEN})"
+
+
+def _ensure_index(cursor, table_name: str, index_name: str, columns: str):
+    """
+    Add an index to an existing table unless it is already there.
+    CREATE TABLE IF NOT EXISTS skips tables created before the index was
+    added to their definition, so those get it here.
+    """
+    cursor.execute(
+        """
+        SELECT 1 FROM INFORMATION_SCHEMA.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s
+        LIMIT 1
+        """,
+        (table_name, index_name),
     )
+    if cursor.fetchone() is None:
+        cursor.execute(f"CREATE INDEX `{index_name}` ON `{table_name}` ({columns})")
 
 
 def ensure_table_exists(df: pd.DataFrame, table_name: str = "customer_defaults"):
     """
     Auto-create the MySQL table based on DataFrame columns if it doesn't exist.
-    Maps pandas dtypes → MySQL column types.
+    Maps pandas dtypes → MySQL column types; text columns are sized from the data.
+    Runs at most once per table per process.
     """
-    type_map = {
-        "int64":   "BIGINT",
-        "float64": "DOUBLE",
-        "bool":    "TINYINT(1)",
-        "object":  "VARCHAR(255)",
-        "datetime64[ns]": "DATETIME",
-    }
+    if table_name in _ensured_tables:
+        return
+
+    # Metadata columns are defined below, not inferred from the frame
+    dtypes = df.dtypes.drop(list(METADATA_COLUMNS), errors="ignore")
 
     col_definitions = []
-    for col, dtype in df.dtypes.items():
-        mysql_type = type_map.get(str(dtype), "VARCHAR(255)")
+    for col, dtype in dtypes.items():
+        if dtype == object:
+            mysql_type = _varchar_type(df[col])
+        else:
+            mysql_type = MYSQL_TYPES.get(str(dtype), "VARCHAR(255)")
         col_definitions.append(f"`{col}` {mysql_type}")
 
     # Add metadata columns
-    col_definitions += [
-        "`uploaded_by` VARCHAR(100)",
-        "`uploaded_at` TIMESTAMP DEFAULT CURRENT_TIMESTAMP",
-    ]
+    col_definitions += [f"`{col}` {definition}" for col, definition in METADATA_COLUMNS.items()]
 
     create_sql = f"""
         CREATE TABLE IF NOT EXISTS `{table_name}` (
             `id` INT AUTO_INCREMENT PRIMARY KEY,
-            {', '.join(col_definitions)}
+            {', '.join(col_definitions)},
+            KEY `idx_uploaded_at` (`uploaded_at` DESC)
         );
     """
 
     conn = get_connection()
-    cursor = conn.cursor()
+    cursor = conn.cursor(buffered=True)
     cursor.execute(create_sql)
+    _ensure_index(cursor, table_name, "idx_uploaded_at", "`uploaded_at` DESC")
     conn.commit()
     cursor.close()
     conn.close()
+    _ensured_tables.add(table_name)
+
+
+def _load_data_infile(cursor, df: pd.DataFrame, table_name: str, cols: str) -> int:
+    """
+    Bulk-load a DataFrame with LOAD DATA LOCAL INFILE.
+    The frame is written to a temporary tab-separated file by pandas' C-level
+    CSV writer (NULL → \\N, no per-cell isna) and the server parses it in a
+    single statement instead of one INSERT per row.
+
+    LOCAL implies IGNORE, so truncated or unconvertible values only raise
+    warnings; any warning fails the load so the caller rolls it back.
+    """
+    overrides = {}
+    # Backslash is the escape character, so literal ones must be doubled
+    for col in df.select_dtypes(include="object").columns:
+        overrides[col] = df[col].replace(r"\\", r"\\\\", regex=True)
+    for col in df.select_dtypes(include="bool").columns:
+        overrides[col] = df[col].astype("int8")
+    if overrides:
+        # assign() returns a new frame, so the caller's df stays intact for the fallback
+        df = df.assign(**overrides)
+
+    tmp_path = None
+    try:
+        with tempfile.NamedTemporaryFile(
+            "w", suffix=".tsv", encoding="utf-8", newline="", delete=False
+        ) as tmp:
+            tmp_path = tmp.name
+            # Tabs are rare in data, so far fewer fields need quoting than with commas
+            df.to_csv(tmp, sep="\t", index=False, header=False, na_rep="\\N", lineterminator="\n")
+
+        path = tmp_path.replace("\\", "/")
+        load_sql = f"""
+            LOAD DATA LOCAL INFILE '{path}' INTO TABLE `{table_name}`
+            CHARACTER SET utf8mb4
+            FIELDS TERMINATED BY '\\t' OPTIONALLY ENCLOSED BY '"' ESCAPED BY '\\\\'
+            LINES TERMINATED BY '\\n'
+            ({cols})
+            SET `uploaded_by` = @uploaded_by
+        """
+        cursor.execute(load_sql)
+        rows_loaded, warnings = cursor.rowcount, cursor.warning_count
+        if warnings:
+            cursor.execute("SHOW WARNINGS LIMIT 1")
+            _, _, first_warning = cursor.fetchone()
+            raise Error(msg=f"LOAD DATA reported {warnings} warning(s), e.g. {first_warning}")
+        return rows_loaded
+    finally:
+        # Also runs when to_csv fails, so a half-written file never leaks
+        if tmp_path:
+            os.remove(tmp_path)
+
+
+def _rows_per_statement(cursor, values) -> int:
+    """
+    Cap rows per multi-row INSERT so one statement stays under the server's
+    max_allowed_packet (estimated from the widest row in a sample) and the
+    prepared-statement placeholder limit.
+    """
+    cursor.execute("SELECT @@max_allowed_packet")
+    (max_packet,) = cursor.fetchone()
+    row_bytes = 2 * max(len(str(row)) for row in values[:100])
+    # Prepared statements also allow at most 65535 placeholders
+    max_rows = min(ROWS_PER_STMT, MAX_PLACEHOLDERS // values.shape[1])
+    return max(1, min(max_rows, max_packet // row_bytes))
+
+
+def _insert_batches(conn, cursor, df: pd.DataFrame, table_name: str, cols: str):
+    """
+    Fallback path: upload rows with multi-row INSERTs when LOCAL INFILE is disabled.
+    Each statement carries up to ROWS_PER_STMT rows; batches of BATCH_SIZE rows
+    are committed one at a time to bound memory. Statements go through a
+    prepared cursor, so every full-size group reuses one server-side parse.
+
+    Yields the row count of each batch after it is committed, so the caller
+    knows how many rows are durable if a later batch fails.
+    """
+    row_placeholder = "(" + ", ".join(["%s"] * len(df.columns)) + ", @uploaded_by)"
+    insert_prefix = f"INSERT INTO `{table_name}` ({cols}, `uploaded_by`) VALUES "
+
+    insert_cursor = conn.cursor(prepared=True)
+    per_stmt = None
+    try:
+        for start in range(0, len(df), BATCH_SIZE):
+            chunk = df.iloc[start:start + BATCH_SIZE]
+            # One vectorized NaN → None pass per batch instead of pd.isna per cell
+            values = chunk.astype(object).where(chunk.notna(), None).to_numpy()
+            if per_stmt is None:
+                per_stmt = _rows_per_statement(cursor, values)
+
+            batch_rows = 0
+            for i in range(0, len(values), per_stmt):
+                group = values[i:i + per_stmt]
+                insert_sql = insert_prefix + ", ".join([row_placeholder] * len(group))
+                insert_cursor.execute(insert_sql, group.ravel().tolist())
+                batch_rows += insert_cursor.rowcount
+            conn.commit()
+            yield batch_rows
+    finally:
+        insert_cursor.close()
 
 
 def upload_dataframe(
@@ -80,7 +290,8 @@ def upload_dataframe(
     table_name: str = "customer_defaults",
 ) -> dict:
     """
-    Upload a pandas DataFrame to MySQL row by row using executemany.
+    Upload a pandas DataFrame to MySQL using LOAD DATA LOCAL INFILE,
+    falling back to multi-row INSERTs when the server has local_infile disabled.
 
     Args:
         df:           DataFrame to upload
@@ -88,37 +299,40 @@ def upload_dataframe(
         table_name:   Target MySQL table name
 
     Returns:
-        dict with rows_inserted and any errors
+        dict with rows_inserted and any errors. On failure rows_inserted is the
+        number of rows already committed by earlier INSERT batches.
     """
-    # Add metadata
-    df = df.copy()
-    df["uploaded_by"] = uploaded_by
+    # Metadata columns are filled in by the server, never from the file
+    if df.columns.isin(list(METADATA_COLUMNS)).any():
+        df = df.drop(columns=list(METADATA_COLUMNS), errors="ignore")
 
     # Ensure table exists
     ensure_table_exists(df, table_name)
 
     conn = get_connection()
-    cursor = conn.cursor()
+    cursor = conn.cursor(prepared=False)
 
-    cols = [f"`{c}`" for c in df.columns]
-    placeholders = ", ".join(["%s"] * len(df.columns))
-    insert_sql = f"INSERT INTO `{table_name}` ({', '.join(cols)}) VALUES ({placeholders})"
-
-    # Convert DataFrame rows to list of tuples
-    rows = [
-        tuple(None if pd.isna(v) else v for v in row)
-        for row in df.itertuples(index=False, name=None)
-    ]
+    cols = ", ".join(f"`{c}`" for c in df.columns)
+    rows_committed = 0
 
     try:
-        cursor.executemany(insert_sql, rows)
+        # uploaded_by comes from a session variable instead of a copied column
+        cursor.execute("SET @uploaded_by = %s", (uploaded_by,))
+        try:
+            rows_inserted = _load_data_infile(cursor, df, table_name, cols)
+        except Error as e:
+            if e.errno not in _LOCAL_INFILE_DISABLED:
+                raise
+            log.warning(f"LOCAL INFILE unavailable, falling back to INSERTs: {e}")
+            for batch_rows in _insert_batches(conn, cursor, df, table_name, cols):
+                rows_committed += batch_rows
+            rows_inserted = rows_committed
         conn.commit()
-        rows_inserted = cursor.rowcount
         return {"success": True, "rows_inserted": rows_inserted, "error": None}
     except Error as e:
         conn.rollback()
         log.error(f"MySQL upload failed: {e}")
-        return {"success": False, "rows_inserted": 0, "error": str(e)}
+        return {"success": False, "rows_inserted": rows_committed, "error": str(e)}
     finally:
         cursor.close()
         conn.close()
@@ -127,13 +341,19 @@ def upload_dataframe(
 def fetch_recent_uploads(table_name: str = "customer_defaults", limit: int = 100) -> pd.DataFrame:
     """
     Fetch the most recently uploaded rows from MySQL.
+    Rows are fetched with a plain cursor and built into a DataFrame in one go.
     """
     try:
         conn = get_connection()
-        query = f"SELECT * FROM `{table_name}` ORDER BY uploaded_at DESC LIMIT {limit}"
-        df = pd.read_sql(query, conn)
-        conn.close()
-        return df
+        cursor = conn.cursor(buffered=True)
+        try:
+            query = f"SELECT * FROM `{table_name}` ORDER BY uploaded_at DESC LIMIT %s"
+            cursor.execute(query, (limit,))
+            rows = cursor.fetchall()
+            return pd.DataFrame.from_records(rows, columns=cursor.column_names)
+        finally:
+            cursor.close()
+            conn.close()
     except Error as e:
         log.error(f"Fetch failed: {e}")
-        return pd.DataFrame()
\ No newline at end of file
+        return pd.DataFrame()
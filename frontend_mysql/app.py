@@ -1,7 +1,7 @@
 import streamlit as st
 
 # Global Styling
-st.markdown("""
+_CSS = """
 <style>
 body {
     background-color: #f5f7fa;
@@ -67,17 +67,24 @@ body {
     margin-top: 5px;
 }
 </style>
-""", unsafe_allow_html=True)
+"""
+
+st.markdown(_CSS, unsafe_allow_html=True)
 
 
 import mysql.connector
-from mysql.connector import Error
+from mysql.connector import Error, errorcode
+from mysql.connector.pooling import MySQLConnectionPool
 from dotenv import load_dotenv
 import logging
 import os
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
 import traceback
 import re
+import tempfile
+from contextlib import contextmanager
 
 load_dotenv()
 
@@ -96,86 +103,177 @@ db_config = {
         'user': os.getenv("DB_USER"),
         'password': os.getenv("DB_PASSWORD"),
         'database': os.getenv("DB_NAME"),
-        'port' : os.getenv("DB_PORT"),
+        'port' : int(os.getenv("DB_PORT", 3306)),
         'charset' : "utf8mb4",
-        'connection_timeout' : 10,
+        # No connection_timeout: mysql-connector also applies it as the read timeout of
+        # every statement, which would cut off large LOAD DATA / INSERT chunks
+        # LOAD DATA LOCAL INFILE also needs `SET GLOBAL local_infile=1` on the server
+        'allow_local_infile' : True,
+        # C-extension protocol implementation instead of the pure-Python one
+        'use_pure' : False,
     }
 
+@st.cache_resource
+def get_pool():
+    """Create the MySQL connection pool once per Streamlit process"""
+    return MySQLConnectionPool(pool_name="deta", pool_size=8, **db_config)
+
 def get_connection():
+    """Check out a pooled connection; conn.close() returns it to the pool"""
+    return get_pool().get_connection()
 
-    return mysql.connector.connect(
-                host=db_config['host'],
-                user=db_config['user'],
-                password=db_config['password'],
-                port = db_config['port'],
-                database=db_config['database'],
-                charset =db_config['charset'],
-                connection_timeout=db_config['connection_timeout']
-            )
+@contextmanager
+def cursor_of(conn, **kwargs):
+    """Yield a cursor that is closed on exit, even on early return or error"""
+    cur = conn.cursor(**kwargs)
+    try:
+        yield cur
+    finally:
+        cur.close()
+
+# Infer MySQL types from pandas, keyed on dtype.kind (one dict lookup per column)
+MYSQL_TYPE_BY_KIND = {
+    "i": "INT",
+    "u": "INT",
+    "f": "DOUBLE",
+    "b": "BOOLEAN",
+    "M": "DATETIME",
+}
 
-# Infer MySQL types from pandas
 def infer_mysql_type(dtype):
-    if pd.api.types.is_integer_dtype(dtype):
-        return "INT"
-    elif pd.api.types.is_float_dtype(dtype):
-        return "DOUBLE"
-    elif pd.api.types.is_bool_dtype(dtype):
-        return "BOOLEAN"
-    elif pd.api.types.is_datetime64_any_dtype(dtype):
-        return "DATETIME"
-    else:
-        return "TEXT"
+    return MYSQL_TYPE_BY_KIND.get(getattr(dtype, "kind", None), "TEXT")
     
 # create table from dataframe
-def create_table_from_df(conn, df, table_name):
+def create_table_from_df(conn, df, table_name, commit=True):
     try:
-        cursor = conn.cursor()
-        columns = []
-        for col in df.columns:
-            mysql_type = infer_mysql_type(df[col].dtype)
-            if col == "applicant_id":
-                columns.append(f"`{col}` {mysql_type} PRIMARY KEY")  # ← set as PK
-            else:
-                columns.append(f"`{col}` {mysql_type}")
+        columns = [
+            f"`{col}` {infer_mysql_type(dtype)}" + (" PRIMARY KEY" if col == "applicant_id" else "")  # ← set as PK
+            for col, dtype in df.dtypes.items()
+        ]
 
         create_query = f"""
         CREATE TABLE IF NOT EXISTS `{table_name}` (
             {', '.join(columns)}
         )
         """
-        cursor.execute(create_query)
-        conn.commit()
-        cursor.close()
+        with cursor_of(conn) as cur:
+            cur.execute(create_query)
+        if commit:
+            conn.commit()
         logger.info(f"Table '{table_name}' created or already exists")
+        remember_table_columns(table_name, df.columns)
     except mysql.connector.Error as e:
         logger.error(f"Database error creating table '{table_name}': {str(e)}", exc_info=True)
+        invalidate_catalog()
         raise
     except Exception as e:
         logger.error(f"Unexpected error creating table '{table_name}': {str(e)}", exc_info=True)
         raise
 
-# Insert the data in bulk
-def insert_dataframe(conn, df, table_name):
+# Rows per multi-VALUES INSERT, further capped so one statement stays under
+# the server's max_allowed_packet (4MB on older MySQL defaults)
+INSERT_CHUNK_ROWS = 500
+MAX_STATEMENT_BYTES = 4 * 1024 * 1024
+# Server limit on placeholders in one prepared statement
+MAX_PLACEHOLDERS = 65535
+
+def rows_per_insert(sample_rows):
+    """Pick a chunk size from the widest sampled row's estimated byte length"""
+    row_bytes = 2 * max(len(str(row)) for row in sample_rows)
+    max_rows = min(INSERT_CHUNK_ROWS, MAX_PLACEHOLDERS // len(sample_rows[0]))
+    return max(1, min(max_rows, MAX_STATEMENT_BYTES // row_bytes))
+
+# Uploads above this many rows are bulk-loaded with LOAD DATA LOCAL INFILE
+LOAD_DATA_MIN_ROWS = 10_000
+
+# Errors meaning LOCAL INFILE is switched off, so we fall back to INSERTs
+LOCAL_INFILE_DISABLED = {errorcode.ER_NOT_ALLOWED_COMMAND, errorcode.ER_CLIENT_LOCAL_FILES_DISABLED}
+
+def load_data_infile(conn, df, table_name):
+    """
+    Bulk-load a dataframe by writing it to a temp CSV and streaming it with
+    LOAD DATA LOCAL INFILE. Returns the number of rows loaded, or None if the
+    server has local_infile disabled. IGNORE turns bad values into warnings, so any
+    warning other than a skipped duplicate key fails the load.
+    """
+    tmp_path = None
     try:
-        cursor = conn.cursor()
+        # Backslash is the escape character, so literal ones must be doubled
+        csv_df = df.replace(r"\\", r"\\\\", regex=True)
+        bool_cols = csv_df.select_dtypes(include="bool").columns
+        csv_df[bool_cols] = csv_df[bool_cols].astype(int)
 
-        # Replace NaN/NaT with None so MySQL receives proper NULL
-        df = df.where(pd.notnull(df), None)
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", encoding="utf-8", newline="", delete=False) as tmp:
+            tmp_path = tmp.name
+            csv_df.to_csv(tmp, index=False, na_rep="\\N", lineterminator="\n")
 
-        placeholders = ", ".join(["%s"] * len(df.columns))
         columns = ", ".join([f"`{col}`" for col in df.columns])
-
-        insert_query = f"""
-        INSERT IGNORE INTO `{table_name}` ({columns})
-        VALUES ({placeholders})
+        load_query = f"""
+        LOAD DATA LOCAL INFILE %s IGNORE INTO TABLE `{table_name}`
+        CHARACTER SET utf8mb4
+        FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '"' ESCAPED BY '\\\\'
+        LINES TERMINATED BY '\\n'
+        IGNORE 1 LINES
+        ({columns})
         """
+        with cursor_of(conn) as cur:
+            cur.execute(load_query, (tmp_path,))
+            loaded = cur.rowcount
+            if cur.warning_count:
+                cur.execute("SHOW WARNINGS")
+                problems = [w for w in cur.fetchall() if w[1] != errorcode.ER_DUP_ENTRY]
+                if problems:
+                    raise ValueError(
+                        f"{len(problems)} value(s) could not be stored in '{table_name}', e.g. {problems[0][2]}"
+                    )
+            return loaded
+    except mysql.connector.Error as e:
+        if e.errno in LOCAL_INFILE_DISABLED:
+            logger.warning(f"LOCAL INFILE disabled, falling back to INSERT for '{table_name}'")
+            return None
+        raise
+    finally:
+        if tmp_path:
+            os.remove(tmp_path)
+
+# Insert the data in bulk. Duplicate applicant_ids are left to the PRIMARY KEY:
+# IGNORE skips them server-side, so no pandas dedup pass is needed.
+# Returns the number of rows actually inserted.
+def insert_dataframe(conn, df, table_name, commit=True):
+    try:
+        # Large uploads: the server parses one CSV stream instead of many INSERTs
+        loaded = load_data_infile(conn, df, table_name) if len(df) > LOAD_DATA_MIN_ROWS else None
+        if loaded is not None:
+            if commit:
+                conn.commit()
+            logger.info(f"Loaded {loaded} of {len(df)} rows into table '{table_name}' via LOAD DATA")
+            return loaded
+
+        row_placeholders = "(" + ", ".join(["%s"] * len(df.columns)) + ")"
+        columns = ", ".join([f"`{col}`" for col in df.columns])
 
-        data = [tuple(row) for row in df.itertuples(index=False, name=None)]
-
-        cursor.executemany(insert_query, data)
-        conn.commit()
-        cursor.close()
-        logger.info(f"Inserted {len(data)} rows into table '{table_name}'")
+        # Python values with NaN/NaT/NA → None (MySQL NULL), converted in one C-level pass
+        data = df.to_numpy(dtype=object, na_value=None)
+
+        # One INSERT ... VALUES (...), (...) per chunk instead of a statement per row;
+        # everything is committed once at the end
+        chunk_rows = rows_per_insert(data[:100].tolist()) if len(data) else 1
+        inserted = 0
+        # Prepared cursor: every full-size chunk has the same SQL, so the server
+        # parses it once and later chunks only bind parameters
+        with cursor_of(conn, prepared=True) as cur:
+            for start in range(0, len(data), chunk_rows):
+                chunk = data[start:start + chunk_rows]
+                insert_query = (
+                    f"INSERT IGNORE INTO `{table_name}` ({columns}) VALUES "
+                    + ", ".join([row_placeholders] * len(chunk))
+                )
+                cur.execute(insert_query, chunk.ravel().tolist())
+                inserted += cur.rowcount
+        if commit:
+            conn.commit()
+        logger.info(f"Inserted {inserted} of {len(data)} rows into table '{table_name}'")
+        return inserted
     except mysql.connector.Error as e:
         logger.error(f"Database error inserting data into '{table_name}': {str(e)}", exc_info=True)
         raise
@@ -185,22 +283,38 @@ def insert_dataframe(conn, df, table_name):
 
 # Registry Functions
 
-def ensure_registry(conn):
+# Registry indexes: newest-first listing and the per-table latest-upload lookup
+REGISTRY_INDEXES = {
+    "idx_name_time": "`table_name`, `uploaded_at` DESC",
+    "idx_time": "`uploaded_at` DESC",
+}
+
+def ensure_registry(conn, commit=True):
     """Create the _uploaded_tables tracking table if it doesn't exist"""
     try:
-        cursor = conn.cursor()
-        create_registry_query = """
+        create_registry_query = f"""
         CREATE TABLE IF NOT EXISTS `_uploaded_tables` (
             `id` INT AUTO_INCREMENT PRIMARY KEY,
             `table_name` VARCHAR(255) NOT NULL,
             `uploaded_by` VARCHAR(255) NOT NULL,
             `uploaded_at` TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            `row_count` INT NOT NULL
+            `row_count` INT NOT NULL,
+            {", ".join(f"INDEX `{name}` ({columns})" for name, columns in REGISTRY_INDEXES.items())}
         )
         """
-        cursor.execute(create_registry_query)
-        conn.commit()
-        cursor.close()
+        with cursor_of(conn) as cur:
+            cur.execute(create_registry_query)
+            # CREATE TABLE IF NOT EXISTS leaves registries created before the indexes untouched
+            cur.execute(
+                "SELECT DISTINCT `INDEX_NAME` FROM INFORMATION_SCHEMA.STATISTICS "
+                "WHERE `TABLE_SCHEMA` = DATABASE() AND `TABLE_NAME` = '_uploaded_tables'"
+            )
+            existing_indexes = {row[0] for row in cur.fetchall()}
+            for name, columns in REGISTRY_INDEXES.items():
+                if name not in existing_indexes:
+                    cur.execute(f"CREATE INDEX `{name}` ON `_uploaded_tables` ({columns})")
+        if commit:
+            conn.commit()
         logger.info("Registry table ensured")
     except mysql.connector.Error as e:
         logger.error(f"Database error creating registry table: {str(e)}", exc_info=True)
@@ -209,17 +323,17 @@ def ensure_registry(conn):
         logger.error(f"Unexpected error creating registry table: {str(e)}", exc_info=True)
         raise
 
-def register_table(conn, table_name, uploader, row_count):
+def register_table(conn, table_name, uploader, row_count, commit=True):
     """Record every upload with table name, uploader, timestamp and row count"""
     try:
-        cursor = conn.cursor()
         register_query = """
         INSERT INTO `_uploaded_tables` (`table_name`, `uploaded_by`, `row_count`)
         VALUES (%s, %s, %s)
         """
-        cursor.execute(register_query, (table_name, uploader, row_count))
-        conn.commit()
-        cursor.close()
+        with cursor_of(conn) as cur:
+            cur.execute(register_query, (table_name, uploader, row_count))
+        if commit:
+            conn.commit()
         logger.info(f"Registered table '{table_name}' uploaded by '{uploader}' with {row_count} rows")
     except mysql.connector.Error as e:
         logger.error(f"Database error registering table: {str(e)}", exc_info=True)
@@ -228,48 +342,31 @@ def register_table(conn, table_name, uploader, row_count):
         logger.error(f"Unexpected error registering table: {str(e)}", exc_info=True)
         raise
 
-def get_registered_tables(conn):
-    """Fetch only app-registered tables, ignoring everything else in the DB"""
-    try:
-        cursor = conn.cursor()
-        query = """
-        SELECT DISTINCT `table_name` FROM `_uploaded_tables` ORDER BY `uploaded_at` DESC
-        """
-        cursor.execute(query)
-        tables = [row[0] for row in cursor.fetchall()]
-        cursor.close()
-        return tables
-    except mysql.connector.Error as e:
-        logger.error(f"Database error fetching registered tables: {str(e)}", exc_info=True)
-        return []
-
 def get_registry_data(conn):
     """Fetch the full registry table data for display"""
     try:
-        cursor = conn.cursor()
         query = """
         SELECT `table_name`, `uploaded_by`, `uploaded_at`, `row_count` 
         FROM `_uploaded_tables` 
         ORDER BY `uploaded_at` DESC
         """
-        cursor.execute(query)
-        columns = [desc[0] for desc in cursor.description]
-        data = cursor.fetchall()
-        cursor.close()
-        return columns, data
+        with cursor_of(conn) as cur:
+            cur.execute(query)
+            return [desc[0] for desc in cur.description], cur.fetchall()
     except mysql.connector.Error as e:
         logger.error(f"Database error fetching registry data: {str(e)}", exc_info=True)
         return [], []
 
 def get_table_columns(conn, table_name):
-    """Get all existing columns in a table"""
+    """Get all existing columns in a table as a set (empty if the table doesn't exist)"""
     try:
-        cursor = conn.cursor()
-        query = f"DESCRIBE `{table_name}`"
-        cursor.execute(query)
-        columns = [row[0] for row in cursor.fetchall()]
-        cursor.close()
-        return columns
+        query = """
+        SELECT `COLUMN_NAME` FROM INFORMATION_SCHEMA.COLUMNS
+        WHERE `TABLE_SCHEMA` = DATABASE() AND `TABLE_NAME` = %s
+        """
+        with cursor_of(conn) as cur:
+            cur.execute(query, (table_name,))
+            return {row[0] for row in cur.fetchall()}
     except mysql.connector.Error as e:
         logger.error(f"Database error getting columns for '{table_name}': {str(e)}", exc_info=True)
         return None
@@ -277,37 +374,120 @@ def get_table_columns(conn, table_name):
         logger.error(f"Unexpected error getting columns for '{table_name}': {str(e)}", exc_info=True)
         return None
 
+# Cached registry lookups. Streamlit reruns the whole script on every widget
+# interaction, so these hold results for a TTL window instead of querying each time.
+# They open their own pooled connection because a conn argument can't be hashed.
+@st.cache_data(ttl=30, show_spinner=False)
+def cached_registry():
+    conn = get_connection()
+    try:
+        return get_registry_data(conn)
+    finally:
+        conn.close()
+
+def clear_registry_caches():
+    """Invalidate cached registry/schema lookups after an upload or on Refresh"""
+    cached_registry.clear()
+
+# Session schema catalog: {table_name: {columns}} for the current database, fetched
+# once per session and kept in sync with our own DDL instead of re-querying per upload
+def get_catalog(conn):
+    """Return the cached catalog, loading it with one INFORMATION_SCHEMA query if needed"""
+    if "_catalog" not in st.session_state:
+        catalog = {}
+        with cursor_of(conn) as cur:
+            cur.execute(
+                "SELECT `TABLE_NAME`, `COLUMN_NAME` FROM INFORMATION_SCHEMA.COLUMNS WHERE `TABLE_SCHEMA` = DATABASE()"
+            )
+            for table, column in cur.fetchall():
+                catalog.setdefault(table, set()).add(column)
+        st.session_state["_catalog"] = catalog
+    return st.session_state["_catalog"]
+
+def remember_table_columns(table_name, columns):
+    """Record a table we just created; an already-known table keeps its full column set"""
+    if "_catalog" in st.session_state:
+        st.session_state["_catalog"].setdefault(table_name, set(columns))
+
+def invalidate_catalog():
+    """Drop the cached catalog so the next upload reloads it from the server"""
+    st.session_state.pop("_catalog", None)
+
 def validate_and_append_data(conn, df, table_name):
     """
     Validate data before insertion. If table exists, only keep columns that already exist.
     If table doesn't exist, create it with all columns.
     Returns the validated dataframe or None if validation fails.
     """
-    cursor = conn.cursor()
-    
     try:
-        # Check if table exists
-        check_query = f"SELECT 1 FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s"
-        cursor.execute(check_query, (table_name,))
-        table_exists = cursor.fetchone()
-        cursor.close()
-        
-        if table_exists:
-            # Table exists - only keep columns that already exist
+        existing_columns = get_catalog(conn).get(table_name)
+        if existing_columns is None:
+            # Unknown to the session catalog: ask the server in case another session created it.
+            # No columns means the table doesn't exist yet
             existing_columns = get_table_columns(conn, table_name)
+            if existing_columns is None:
+                return None, "Unable to validate table structure. Please try again."
             if existing_columns:
-                # Filter DF to only include existing columns
-                columns_to_keep = [col for col in df.columns if col in existing_columns]
-                if not columns_to_keep:
-                    return None, "No matching columns found in existing table."
-                df = df[columns_to_keep]
+                get_catalog(conn)[table_name] = existing_columns
+
+        if existing_columns:
+            # Table exists - only keep columns that already exist
+            columns_to_keep = [col for col in df.columns if col in existing_columns]
+            if not columns_to_keep:
+                return None, "No matching columns found in existing table."
+            df = df[columns_to_keep]
         
         return df, None
     except Exception as e:
         logger.error(f"Error validating data for table {table_name}: {str(e)}", exc_info=True)
-        cursor.close()
         return None, "Unable to validate table structure. Please try again."
 
+# Bytes parsed per pyarrow block, and rows converted to pandas and inserted per chunk
+CSV_BLOCK_BYTES = 8 << 20
+CSV_CHUNK_ROWS = 50_000
+
+def read_csv_chunks(uploaded_file, chunk_rows=CSV_CHUNK_ROWS):
+    """
+    Stream the uploaded CSV with pyarrow's block reader and yield pandas chunks of at most
+    chunk_rows rows with normalized column names. Only one block is parsed and one chunk
+    converted at a time, so memory beyond the uploaded bytes stays bounded.
+    Files pyarrow rejects are read with pandas instead, continuing after the rows
+    already yielded.
+    """
+    yielded = 0
+    try:
+        uploaded_file.seek(0)
+        reader = pacsv.open_csv(
+            uploaded_file,
+            read_options=pacsv.ReadOptions(block_size=CSV_BLOCK_BYTES),
+            # Quoted fields may span lines, as the pandas reader always allowed
+            parse_options=pacsv.ParseOptions(delimiter=",", newlines_in_values=True),
+            convert_options=pacsv.ConvertOptions(strings_can_be_null=True),
+        )
+        for batch in reader:
+            for start in range(0, batch.num_rows, chunk_rows):
+                chunk = batch.slice(start, chunk_rows).to_pandas()
+                chunk.columns = chunk.columns.str.lower().str.strip()
+                yielded += len(chunk)
+                yield chunk
+    except pa.ArrowInvalid as e:
+        # e.g. a column whose type changes after the first block; pandas infers per chunk
+        logger.warning(f"pyarrow could not parse the upload after {yielded} rows, using pandas: {str(e)}")
+        uploaded_file.seek(0)
+        for chunk in pd.read_csv(uploaded_file, chunksize=chunk_rows):
+            if yielded >= len(chunk):
+                yielded -= len(chunk)
+                continue
+            chunk = chunk.iloc[yielded:]
+            yielded = 0
+            chunk.columns = chunk.columns.str.lower().str.strip()
+            yield chunk
+
+# Patterns for sanitize_error_message, compiled once at import
+HOST_PATTERN = re.compile(r'\d{1,3}(?:\.\d{1,3}){3}|localhost|127\.0\.0\.1', re.IGNORECASE)
+CREDENTIAL_PATTERN = re.compile(r"(database|user|password|host|port)\s*[=:][^,;\)\n]*", re.IGNORECASE)
+PATH_PATTERN = re.compile(r'[C-Z]:\\[^\s]*|/[^\s]*\.[^\s]+')
+
 def sanitize_error_message(error_str):
     """
     Remove sensitive information from error messages.
@@ -319,19 +499,17 @@ def sanitize_error_message(error_str):
     sanitized = str(error_str)
     
     # Hide IP addresses and hostnames
-    sanitized = re.sub(r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}', '[HOST]', sanitized)
-    sanitized = re.sub(r'localhost|127\.0\.0\.1', '[HOST]', sanitized, flags=re.IGNORECASE)
+    sanitized = HOST_PATTERN.sub('[HOST]', sanitized)
     
     # Hide database names and user info
-    sanitized = re.sub(r"(database|user|password|host|port)\s*[=:][^,;\)\n]*", r'\1=[REDACTED]', sanitized, flags=re.IGNORECASE)
+    sanitized = CREDENTIAL_PATTERN.sub(r'\1=[REDACTED]', sanitized)
     
     # Hide SQL queries (truncate to generic message)
     if 'SQL' in sanitized.upper() or 'SELECT' in sanitized.upper() or 'INSERT' in sanitized.upper():
         sanitized = "Database operation failed. Please check your data and try again."
     
-    # Hide file paths
-    sanitized = re.sub(r'[C-Z]:\\[^\s]*', '[PATH]', sanitized)
-    sanitized = re.sub(r'/[^\s]*\.[^\s]+', '[PATH]', sanitized)
+    # Hide file paths (Windows and Unix)
+    sanitized = PATH_PATTERN.sub('[PATH]', sanitized)
     
     return sanitized if sanitized.strip() else "An unexpected error occurred. Please try again."
 
@@ -439,11 +617,17 @@ def show_app():
         uploaded_file = st.file_uploader("Upload CSV File", type=["csv"])
 
         if uploaded_file:
-            df = pd.read_csv(uploaded_file)
-            df.columns = df.columns.str.lower().str.strip()
+            # Only the first block is parsed and the first few rows converted for the preview
+            try:
+                preview_df = next(read_csv_chunks(uploaded_file, chunk_rows=5), pd.DataFrame())
+            except Exception as e:
+                logger.error(f"Unable to parse uploaded CSV: {str(e)}", exc_info=True)
+                safe_msg = sanitize_error_message(str(e))
+                st.error(f"❌ Unable to read the CSV file: {safe_msg}")
+                st.stop()
 
             st.subheader("Preview")
-            st.dataframe(df.head())
+            st.dataframe(preview_df)
 
             # Split into two columns
             col1, col2 = st.columns(2)
@@ -461,45 +645,64 @@ def show_app():
                         st.error("❌ Your Full Name is required. Please provide your name to upload.")
                     elif not table_name or table_name.strip() == "":
                         st.error("❌ Target Table Name is required.")
-                    elif "applicant_id" not in df.columns:
+                    elif "applicant_id" not in preview_df.columns:
                         st.error("❌ CSV must contain an 'applicant_id' column to use as primary key.")
                     else:
-                        # Drop rows with missing applicant_id — PK cannot be null
-                        before = len(df)
-                        df = df.dropna(subset=["applicant_id"])
-                        df["applicant_id"] = df["applicant_id"].astype(int)
-                        dropped = before - len(df)
-
-                        if dropped > 0:
-                            st.warning(f"⚠️ Dropped {dropped} rows with missing applicant_id.")
-
-                        # Replace remaining NaNs with None for MySQL NULL
-                        df = df.where(pd.notnull(df), None)
-
                         conn = get_connection()
-                        
-                        # Ensure registry exists
-                        ensure_registry(conn)
-                        
-                        # Validate and filter columns if table exists
-                        df_filtered, error_msg = validate_and_append_data(conn, df, table_name)
-                        
-                        if error_msg:
-                            st.error(f"❌ {error_msg}")
-                        else:
-                            # Create table if it doesn't exist, otherwise it's already validated
-                            create_table_from_df(conn, df_filtered, table_name)
-                            insert_dataframe(conn, df_filtered, table_name)
-                            
-                            # Register the upload
-                            register_table(conn, table_name, uploader_name, len(df_filtered))
-                            
+                        try:
+                            # The whole upload is one transaction with a single commit at the end
+                            # (CREATE TABLE still commits implicitly, as all MySQL DDL does)
+                            ensure_registry(conn, commit=False)
+
+                            # Stream the CSV chunk by chunk into MySQL so memory stays bounded
+                            total_rows, dropped, skipped, error_msg = 0, 0, 0, None
+                            for i, chunk in enumerate(read_csv_chunks(uploaded_file)):
+                                # Drop rows with missing applicant_id — PK cannot be null
+                                # (one mask and one cast instead of dropna() + astype() copying twice)
+                                before = len(chunk)
+                                chunk = chunk.loc[chunk["applicant_id"].notna()].astype({"applicant_id": "int64"})
+                                dropped += before - len(chunk)
+
+                                if i == 0:
+                                    # The first chunk fixes the schema: validate and filter columns
+                                    # if the table exists, otherwise create it
+                                    chunk, error_msg = validate_and_append_data(conn, chunk, table_name)
+                                    if error_msg:
+                                        break
+                                    upload_columns = list(chunk.columns)
+                                    create_table_from_df(conn, chunk, table_name, commit=False)
+                                else:
+                                    chunk = chunk[upload_columns]
+
+                                inserted = insert_dataframe(conn, chunk, table_name, commit=False)
+                                total_rows += inserted
+                                skipped += len(chunk) - inserted
+
+                            if dropped > 0:
+                                st.warning(f"⚠️ Dropped {dropped} rows with missing applicant_id.")
+                            if skipped > 0:
+                                st.warning(f"⚠️ Skipped {skipped} rows whose applicant_id already exists.")
+
+                            if error_msg:
+                                st.error(f"❌ {error_msg}")
+                            else:
+                                # Register the upload
+                                register_table(conn, table_name, uploader_name, total_rows, commit=False)
+                                conn.commit()
+
+                                clear_registry_caches()
+
+                                st.success(f"✅ Uploaded {total_rows:,} rows to `{table_name}` by {uploader_name}")
+                                logger.info(f"Upload successful: table='{table_name}', uploader='{uploader_name}', rows={total_rows}")
+                        except Exception:
+                            conn.rollback()
+                            raise
+                        finally:
+                            # Always hand the connection back to the pool
                             conn.close()
 
-                            st.success(f"✅ Uploaded {len(df_filtered):,} rows to `{table_name}` by {uploader_name}")
-                            logger.info(f"Upload successful: table='{table_name}', uploader='{uploader_name}', rows={len(df_filtered)}")
-
                 except mysql.connector.Error as e:
+                    invalidate_catalog()
                     logger.error(f"Database error during upload: {str(e)}", exc_info=True)
                     st.error("❌ Unable to connect to database. Please check your network and try again.")
                 except Exception as e:
@@ -513,60 +716,92 @@ def show_app():
 
         try:
             conn = get_connection()
-            
-            # Ensure registry exists
-            ensure_registry(conn)
-            
-            # Display the full Upload Registry table at the top
-            st.subheader("📋 Upload Registry")
-            registry_columns, registry_data = get_registry_data(conn)
-            
-            if registry_data:
+            try:
+                # Ensure registry exists
+                ensure_registry(conn)
+
+                # Display the full Upload Registry table at the top
+                st.subheader("📋 Upload Registry")
+                if st.button("🔄 Refresh"):
+                    clear_registry_caches()
+                    st.session_state.pop("table_preview", None)
+                registry_columns, registry_data = cached_registry()
                 registry_df = pd.DataFrame(registry_data, columns=registry_columns)
-                st.dataframe(registry_df, use_container_width=True, hide_index=True)
-            else:
-                st.info("No uploads recorded yet.")
-            
-            st.markdown("---")
-            
-            # Get registered tables only
-            tables = get_registered_tables(conn)
-            
-            if tables:
-                st.subheader("📊 Preview Table Data")
-                selected_table = st.selectbox("Select Table to Preview", tables)
-                
-                if st.button("Load Table"):
-                    # Get metadata for selected table
-                    cursor = conn.cursor()
-                    metadata_query = """
-                    SELECT `uploaded_by`, `uploaded_at`, `row_count` 
-                    FROM `_uploaded_tables` 
-                    WHERE `table_name` = %s 
-                    ORDER BY `uploaded_at` DESC 
-                    LIMIT 1
-                    """
-                    cursor.execute(metadata_query, (selected_table,))
-                    metadata = cursor.fetchone()
-                    cursor.close()
-                    
-                    if metadata:
-                        uploader, upload_date, row_count = metadata
-                        caption = f"Uploaded by: **{uploader}** | Date: **{upload_date}** | Total Rows: **{row_count}**"
-                        st.markdown(caption)
-                    
-                    # Load and display table data
-                    df = pd.read_sql(f"SELECT * FROM `{selected_table}` LIMIT 1000", conn)
-                    st.dataframe(df, use_container_width=True)
-                    
-                    if len(df) >= 1000:
-                        st.info(f"Showing first 1000 rows out of {row_count} total rows.")
-                    
-                    logger.info(f"User '{st.session_state.username}' viewed table '{selected_table}'")
-            else:
-                st.info("No tables have been uploaded yet.")
-            
-            conn.close()
+
+                if not registry_df.empty:
+                    st.dataframe(registry_df, use_container_width=True, hide_index=True)
+                else:
+                    st.info("No uploads recorded yet.")
+
+                st.markdown("---")
+
+                # Registered tables come from the registry rows already fetched, newest upload first
+                tables = registry_df["table_name"].drop_duplicates().tolist() if not registry_df.empty else []
+
+                if tables:
+                    st.subheader("📊 Preview Table Data")
+                    selected_table = st.selectbox("Select Table to Preview", tables)
+
+                    if st.button("Load Table"):
+                        # Query only on the click; the result is kept in session_state so later
+                        # reruns (row-count check, other widgets) redraw it without re-querying
+                        metadata_query = """
+                        SELECT `uploaded_by`, `uploaded_at`, `row_count` 
+                        FROM `_uploaded_tables` 
+                        WHERE `table_name` = %s 
+                        ORDER BY `uploaded_at` DESC 
+                        LIMIT 1
+                        """
+                        with cursor_of(conn) as cur:
+                            cur.execute(metadata_query, (selected_table,))
+                            metadata = cur.fetchone()
+
+                        # Load table data straight from the cursor, no read_sql adapter
+                        with cursor_of(conn) as cur:
+                            cur.execute(f"SELECT * FROM `{selected_table}` LIMIT 1000")
+                            rows = cur.fetchmany(1000)
+                            columns = [desc[0] for desc in cur.description]
+
+                        st.session_state.table_preview = {
+                            "table": selected_table,
+                            "metadata": metadata,
+                            "df": pd.DataFrame.from_records(rows, columns=columns),
+                        }
+                        logger.info(f"User '{st.session_state.username}' viewed table '{selected_table}'")
+
+                    preview = st.session_state.get("table_preview")
+                    if preview and preview["table"] == selected_table:
+                        row_count = None
+                        if preview["metadata"]:
+                            uploader, upload_date, row_count = preview["metadata"]
+                            caption = f"Uploaded by: **{uploader}** | Date: **{upload_date}** | Total Rows: **{row_count}**"
+                            st.markdown(caption)
+
+                        # The registry count is free; only ask the server when the user wants to check it.
+                        # TABLE_ROWS is InnoDB's statistics estimate, but avoids a full COUNT(*) scan
+                        if st.button("Check row count"):
+                            with cursor_of(conn) as cur:
+                                cur.execute(
+                                    "SELECT `TABLE_ROWS` FROM INFORMATION_SCHEMA.TABLES WHERE `TABLE_SCHEMA` = DATABASE() AND `TABLE_NAME` = %s",
+                                    (selected_table,),
+                                )
+                                server_rows = cur.fetchone()
+                            if server_rows and server_rows[0] is not None:
+                                st.caption(f"Server estimate: ~{server_rows[0]:,} rows")
+
+                        df = preview["df"]
+                        st.dataframe(df, use_container_width=True)
+
+                        if len(df) >= 1000:
+                            if row_count is not None:
+                                st.info(f"Showing first 1000 rows out of {row_count} total rows.")
+                            else:
+                                st.info("Showing first 1000 rows.")
+                else:
+                    st.info("No tables have been uploaded yet.")
+            finally:
+                # Always hand the connection back to the pool
+                conn.close()
 
         except mysql.connector.Error as e:
             logger.error(f"Database error retrieving tables: {str(e)}", exc_info=True)